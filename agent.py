@@ -7,14 +7,15 @@ All query functions accept an optional `data_dir` parameter for multi-user suppo
 When data_dir is None, the default DATA_DIR is used (backward compatible).
 """
 
-import json
 import os
+import threading
 import time
 import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, List, Dict
 from zoneinfo import ZoneInfo
 
+import orjson
 from anthropic import Anthropic
 from dotenv import load_dotenv
 
@@ -47,11 +48,14 @@ def invalidate_schema_cache(data_dir=None):
 # ──────────────────────────────────────────────
 
 _sessions: Dict[str, dict] = {}  # session_id → {"messages": [...], "last_active": float}
+# run_agent runs on worker threads for several chats at once, and the bot
+# resets sessions from the event loop thread — every _sessions access holds this
+_sessions_lock = threading.Lock()
 SESSION_TTL = 3600  # 1 hour
 
 
 def _prune_sessions():
-    """Remove expired sessions."""
+    """Remove expired sessions. Caller must hold _sessions_lock."""
     now = time.time()
     expired = [sid for sid, s in _sessions.items() if now - s["last_active"] > SESSION_TTL]
     for sid in expired:
@@ -60,22 +64,49 @@ def _prune_sessions():
 
 def _get_or_create_session(session_id: Optional[str]) -> Tuple[str, list]:
     """Return (session_id, messages). Creates new session if needed."""
-    _prune_sessions()
+    with _sessions_lock:
+        _prune_sessions()
 
-    if session_id and session_id in _sessions:
-        session = _sessions[session_id]
-        session["last_active"] = time.time()
-        return session_id, session["messages"]
+        if session_id and session_id in _sessions:
+            session = _sessions[session_id]
+            session["last_active"] = time.time()
+            return session_id, session["messages"]
 
-    # Create new session
-    new_id = "s_" + uuid.uuid4().hex[:8]
-    _sessions[new_id] = {"messages": [], "last_active": time.time()}
-    return new_id, _sessions[new_id]["messages"]
+        # Create new session
+        new_id = "s_" + uuid.uuid4().hex[:8]
+        _sessions[new_id] = {"messages": [], "last_active": time.time()}
+        return new_id, _sessions[new_id]["messages"]
 
 
 def reset_session(session_id: str) -> None:
     """Remove a session so the next call creates a fresh one."""
-    _sessions.pop(session_id, None)
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
+
+
+def export_sessions(session_ids) -> Dict[str, dict]:
+    """Return a JSON-serializable snapshot of the given live sessions."""
+    snapshot = {}
+    with _sessions_lock:
+        for sid in session_ids:
+            session = _sessions.get(sid)
+            if session:
+                snapshot[sid] = {
+                    "messages": list(session["messages"]),
+                    "last_active": session["last_active"],
+                }
+    return snapshot
+
+
+def import_sessions(snapshot: Dict[str, dict]) -> None:
+    """Restore sessions previously captured with export_sessions (expired ones are dropped)."""
+    with _sessions_lock:
+        for sid, session in snapshot.items():
+            _sessions.setdefault(sid, {
+                "messages": list(session["messages"]),
+                "last_active": session["last_active"],
+            })
+        _prune_sessions()
 
 
 # ──────────────────────────────────────────────
@@ -271,10 +302,10 @@ def run_agent(question: str, session_id: Optional[str] = None, data_dir: Optiona
                         # Track data from SQL queries
                         if tool_name == "run_sql":
                             try:
-                                parsed = json.loads(result)
+                                parsed = orjson.loads(result)
                                 if isinstance(parsed, list):
                                     all_data.extend(parsed[:50])
-                            except (json.JSONDecodeError, TypeError):
+                            except (orjson.JSONDecodeError, TypeError):
                                 pass
                     except Exception as e:
                         result = f"Error: {e}"
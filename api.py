@@ -28,13 +28,19 @@ from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from telegram import Update
 
-from agent import run_agent
+from agent import invalidate_schema_cache, run_agent
 from db import list_memories, delete_memory
+from google_auth import exchange_code, save_credentials
+from sync import sync_calendar_oauth
+from user_registry import ensure_admin_registered, get_user_data_dir, update_user
 
 logger = logging.getLogger(__name__)
 
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+# Optional shared secret Telegram echoes back in X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
 
 # Set by telegram_bot.py at startup for local-dev polling mode only.
 _telegram_bot = None
@@ -62,14 +68,17 @@ def _get_bot(request: Request):
 async def lifespan(app: FastAPI):
     """Manage Telegram webhook bot lifecycle when WEBHOOK_URL is set."""
     if WEBHOOK_URL:
-        from user_registry import ensure_admin_registered
+        # Imported here: telegram_bot imports this module to run the OAuth server
         from telegram_bot import create_webhook_application
 
         ensure_admin_registered()
 
         bot_app = create_webhook_application()
         await bot_app.initialize()
-        await bot_app.bot.set_webhook(url=WEBHOOK_URL)
+        await bot_app.post_init(bot_app)
+        await bot_app.bot.set_webhook(
+            url=WEBHOOK_URL, allowed_updates=["message"], secret_token=WEBHOOK_SECRET
+        )
         await bot_app.start()
         app.state.bot_app = bot_app
         logger.info(f"Telegram webhook set to {WEBHOOK_URL}")
@@ -79,6 +88,7 @@ async def lifespan(app: FastAPI):
         await bot_app.stop()
         await bot_app.bot.delete_webhook()
         await bot_app.shutdown()
+        await bot_app.post_shutdown(bot_app)
         logger.info("Telegram webhook removed")
     else:
         yield
@@ -94,15 +104,17 @@ app = FastAPI(title="Calendar Query API", version="2.0.0", lifespan=lifespan)
 @app.post("/telegram-webhook")
 async def telegram_webhook(request: Request):
     """Receive Telegram updates via webhook (production mode)."""
-    from telegram import Update
-
     bot_app = getattr(request.app.state, "bot_app", None)
     if not bot_app:
         return JSONResponse({"error": "Bot not running in webhook mode"}, status_code=500)
 
+    if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+        return JSONResponse({"error": "Invalid secret token"}, status_code=403)
+
+    # Hand the update to the running Application and ack immediately — awaiting
+    # process_update here would hold the HTTP request open for the whole handler
     data = await request.json()
-    update = Update.de_json(data=data, bot=bot_app.bot)
-    await bot_app.process_update(update)
+    await bot_app.update_queue.put(Update.de_json(data=data, bot=bot_app.bot))
     return {"ok": True}
 
 
@@ -155,9 +167,6 @@ async def health():
 @app.get("/auth/callback")
 async def oauth_callback(request: Request):
     """Handle Google OAuth redirect after user grants calendar access."""
-    from google_auth import exchange_code, save_credentials
-    from user_registry import get_user_data_dir, load_users, save_users
-
     code = request.query_params.get("code")
     state = request.query_params.get("state")
     error = request.query_params.get("error")
@@ -201,18 +210,11 @@ async def oauth_callback(request: Request):
     # Trigger sync in a background thread so we can return the HTML immediately
     def _background_sync():
         try:
-            from sync import sync_calendar_oauth
-            from agent import invalidate_schema_cache
-
             sync_result = sync_calendar_oauth(data_dir, credentials)
             invalidate_schema_cache(data_dir)
 
             # Update user status
-            users = load_users()
-            uid = str(user_id)
-            if uid in users:
-                users[uid]["status"] = "ready"
-                save_users(users)
+            update_user(user_id, status="ready")
 
             # Send Telegram notification
             if bot:
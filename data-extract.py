@@ -1,13 +1,35 @@
 import csv
+import logging
 import os
+import threading
 from datetime import datetime
 from zoneinfo import ZoneInfo
+import httplib2
 from dotenv import load_dotenv
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 
 # Load environment variables from your .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# httplib2.Http isn't thread-safe, so each executor thread keeps its own and
+# reuses its open TLS connection to googleapis.com across syncs.
+_local = threading.local()
+
+
+def _thread_http():
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = _local.http = httplib2.Http(timeout=60)
+    return http
+
+
+# Partial response: only the event fields export_to_csv / _raw_to_dicts read,
+# which skips attendees, creator, reminders etc. and shrinks each page a lot.
+_EVENT_FIELDS = "items(id,summary,start,end,description,location,status,updated),nextPageToken"
+
 
 def _fetch_events(service, calendar_id, time_min):
     """Paginated fetch of events from the Google Calendar API."""
@@ -21,10 +43,11 @@ def _fetch_events(service, calendar_id, time_min):
             orderBy='startTime',
             maxResults=2500,
             pageToken=page_token,
+            fields=_EVENT_FIELDS,
         ).execute()
         batch = events_result.get('items', [])
         all_events.extend(batch)
-        print(f"  Fetched {len(all_events)} events...")
+        logger.info(f"  Fetched {len(all_events)} events...")
         page_token = events_result.get('nextPageToken')
         if not page_token:
             break
@@ -36,14 +59,15 @@ def get_raw_calendar_data_with_creds(start_date_str, credentials, calendar_id="p
 
     Accepts any credential object and paginates through all events.
     """
-    service = build('calendar', 'v3', credentials=credentials)
+    http = AuthorizedHttp(credentials, http=_thread_http())
+    service = build('calendar', 'v3', http=http, cache_discovery=False)
 
     tz_name = os.getenv('YOUR_TIMEZONE', 'America/Los_Angeles')
     tz = ZoneInfo(tz_name)
     start_dt = datetime.strptime(start_date_str, '%Y-%m-%d').replace(tzinfo=tz)
     time_min = start_dt.isoformat()
 
-    print(f"OAuth fetch: {start_date_str} to present")
+    logger.info(f"OAuth fetch: {start_date_str} to present")
     return _fetch_events(service, calendar_id, time_min)
 
 
@@ -78,13 +78,17 @@ def get_connection(data_dir=None):
     return conn
 
 
-def run_sql(query, max_rows=200, data_dir=None):
-    """Execute a read-only SQL query and return results as list of dicts."""
+def run_sql(query, max_rows=200, data_dir=None, params=()):
+    """Execute a read-only SQL query and return results as list of dicts.
+
+    Bind values go in params (? placeholders) rather than being spliced into
+    the SQL, so the statement text stays constant across calls.
+    """
     conn = get_connection(data_dir)
     try:
-        cursor = conn.execute(query)
+        cursor = conn.execute(query, params)
         columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = cursor.fetchmany(max_rows)
+        rows = cursor.fetchall() if max_rows is None else cursor.fetchmany(max_rows)
         return [dict(zip(columns, row)) for row in rows]
     finally:
         conn.close()
@@ -148,7 +152,7 @@ def get_schema(data_dir=None):
 
 def get_sample_rows(n=10, data_dir=None):
     """Return n sample rows from the events table with all fields."""
-    return run_sql(f"SELECT * FROM events ORDER BY RANDOM() LIMIT {n}", data_dir=data_dir)
+    return run_sql("SELECT * FROM events ORDER BY RANDOM() LIMIT ?", data_dir=data_dir, params=(n,))
 
 
 def get_category_distribution(data_dir=None):
@@ -11,6 +11,7 @@ When data_dir is None, the default DATA_DIR is used (backward compatible).
 """
 
 import csv
+import functools
 import json
 import os
 import shutil
@@ -20,6 +21,7 @@ from datetime import datetime
 from zoneinfo import ZoneInfo
 
 import lancedb
+import orjson
 from anthropic import Anthropic
 from dotenv import load_dotenv
 from openai import OpenAI
@@ -41,8 +43,25 @@ EMBEDDING_MODEL = "text-embedding-3-small"
 
 HAIKU_MODEL = "claude-haiku-4-5-20251001"
 
-client = Anthropic(api_key=ANTHROPIC_API_KEY)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+# API clients are built on first use: importing etl (e.g. via sync from the
+# API server) must work without OPENAI_API_KEY, which OpenAI() requires
+_client = None
+_openai_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = Anthropic(api_key=ANTHROPIC_API_KEY)
+    return _client
+
+
+def _get_openai():
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
+
 
 # ──────────────────────────────────────────────
 # CSV Reading + Basic Parsing
@@ -98,6 +117,17 @@ def load_cache(path):
     return {}
 
 
+@functools.lru_cache(maxsize=4)
+def _load_taxonomy(path, mtime_ns):
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def load_taxonomy(path):
+    """Load a taxonomy file, reusing the parsed object until the file changes."""
+    return _load_taxonomy(path, os.stat(path).st_mtime_ns)
+
+
 def save_cache(path, data):
     """Atomically save cache to disk."""
     tmp = path + ".tmp"
@@ -127,7 +157,7 @@ Events:
 
     for attempt in range(3):
         try:
-            response = client.messages.create(
+            response = _get_client().messages.create(
                 model=HAIKU_MODEL,
                 max_tokens=4096,
                 messages=[{"role": "user", "content": prompt}],
@@ -139,7 +169,7 @@ Events:
                 if text.startswith("json"):
                     text = text[4:]
                 text = text.strip()
-            return json.loads(text)
+            return orjson.loads(text)
         except (json.JSONDecodeError, Exception) as e:
             if attempt < 2:
                 print(f"    Retry {attempt+1} for discovery batch: {e}")
@@ -227,7 +257,7 @@ Return ONLY valid JSON in this format:
 }}"""
 
     print("\nConsolidating taxonomy...")
-    response = client.messages.create(
+    response = _get_client().messages.create(
         model="claude-sonnet-4-20250514",
         max_tokens=4096,
         messages=[{"role": "user", "content": prompt}],
@@ -239,7 +269,7 @@ Return ONLY valid JSON in this format:
             text = text[4:]
         text = text.strip()
 
-    taxonomy = json.loads(text)
+    taxonomy = orjson.loads(text)
     save_cache(taxonomy_file, taxonomy)
     print(f"Taxonomy saved: {len(taxonomy['categories'])} categories")
     for cat in taxonomy["categories"]:
@@ -309,7 +339,7 @@ Events:
 
     for attempt in range(3):
         try:
-            response = client.messages.create(
+            response = _get_client().messages.create(
                 model=HAIKU_MODEL,
                 max_tokens=8192,
                 system=system_context,
@@ -321,7 +351,7 @@ Events:
                 if text.startswith("json"):
                     text = text[4:]
                 text = text.strip()
-            results = json.loads(text)
+            results = orjson.loads(text)
             # Validate it's a list
             if not isinstance(results, list):
                 raise ValueError("Expected JSON array")
@@ -703,7 +733,7 @@ def construct_embedding_text(activity, activity_index, all_sub_activities, event
 
 def embed_batch(texts):
     """Embed a batch of texts using OpenAI's embedding API."""
-    response = openai_client.embeddings.create(
+    response = _get_openai().embeddings.create(
         model=EMBEDDING_MODEL,
         input=texts,
     )
@@ -898,8 +928,7 @@ def run_etl(data_dir):
     taxonomy_file = os.path.join(data_dir, "taxonomy.json")
     if os.path.exists(taxonomy_file):
         print(f"\nUsing existing taxonomy from {taxonomy_file}")
-        with open(taxonomy_file) as f:
-            taxonomy = json.load(f)
+        taxonomy = load_taxonomy(taxonomy_file)
     else:
         # Try to copy admin's taxonomy (saves a Sonnet API call)
         from user_registry import ADMIN_USER_ID as _ADMIN_ID, get_user_data_dir as _get_udir
@@ -907,8 +936,7 @@ def run_etl(data_dir):
         if os.path.exists(admin_taxonomy):
             shutil.copy2(admin_taxonomy, taxonomy_file)
             print(f"\nCopied admin taxonomy to {taxonomy_file}")
-            with open(taxonomy_file) as f:
-                taxonomy = json.load(f)
+            taxonomy = load_taxonomy(taxonomy_file)
         else:
             taxonomy = consolidate_taxonomy(discovery_tags, data_dir)
 
@@ -942,6 +970,18 @@ def run_etl(data_dir):
     )
 
 
+def run_etl_in_worker(data_dir):
+    """run_etl for a process pool, with errors flattened to a picklable RuntimeError.
+
+    OpenAI/Anthropic APIStatusError subclasses can't be unpickled in the parent,
+    which would surface as BrokenProcessPool and take the whole pool down.
+    """
+    try:
+        return run_etl(data_dir)
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
 # ──────────────────────────────────────────────
 # Main (backward compatible — uses default DATA_DIR)
 # ──────────────────────────────────────────────
@@ -958,8 +998,7 @@ def main():
     # 3. Consolidate taxonomy
     if os.path.exists(TAXONOMY_FILE):
         print(f"\nUsing existing taxonomy from {TAXONOMY_FILE}")
-        with open(TAXONOMY_FILE) as f:
-            taxonomy = json.load(f)
+        taxonomy = load_taxonomy(TAXONOMY_FILE)
         for cat in taxonomy["categories"]:
             print(f"  - {cat['name']}: {cat['description']}")
     else:
@@ -113,6 +113,21 @@ def get_token_path(data_dir: str) -> str:
     return os.path.join(data_dir, "google_token.json")
 
 
+# data_dirs known to hold a token. Tokens are never deleted, so a hit skips
+# the stat; misses are re-checked since the OAuth callback may have just run.
+_token_dirs: set[str] = set()
+
+
+def has_token(data_dir: str) -> bool:
+    """Return True if the user has a stored OAuth token."""
+    if data_dir in _token_dirs:
+        return True
+    if os.path.exists(get_token_path(data_dir)):
+        _token_dirs.add(data_dir)
+        return True
+    return False
+
+
 def save_credentials(credentials: Credentials, data_dir: str) -> None:
     """Persist OAuth credentials as JSON in the user's data directory."""
     token_path = get_token_path(data_dir)
@@ -127,6 +142,7 @@ def save_credentials(credentials: Credentials, data_dir: str) -> None:
     }
     with open(token_path, "w") as f:
         json.dump(data, f, indent=2)
+    _token_dirs.add(data_dir)
     logger.info(f"Saved OAuth token to {token_path}")
 
 
@@ -135,12 +151,12 @@ def load_credentials(data_dir: str) -> Credentials | None:
 
     Returns None if no token file exists or credentials are invalid.
     """
-    token_path = get_token_path(data_dir)
-    if not os.path.exists(token_path):
+    try:
+        with open(get_token_path(data_dir)) as f:
+            data = json.load(f)
+    except FileNotFoundError:
         return None
-
-    with open(token_path) as f:
-        data = json.load(f)
+    _token_dirs.add(data_dir)
 
     creds = Credentials(
         token=data["token"],
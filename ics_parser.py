@@ -91,6 +91,28 @@ def parse_upload(file_bytes: bytes, filename: str) -> list[dict]:
         raise ValueError(f"Unsupported file type: {filename}. Please send a .ics or .zip file.")
 
 
+def parse_upload_path(path: str, filename: str) -> list[dict]:
+    """Parse an uploaded file already saved to disk (.ics or .zip) into event dicts.
+
+    Like parse_upload, but zip archives are read straight from disk rather than
+    from an in-memory copy of the whole upload.
+    """
+    filename_lower = filename.lower()
+
+    if filename_lower.endswith(".zip"):
+        all_events = []
+        with zipfile.ZipFile(path) as zf:
+            for name in zf.namelist():
+                if name.lower().endswith(".ics"):
+                    all_events.extend(parse_ics_content(zf.read(name)))
+        return all_events
+    elif filename_lower.endswith(".ics"):
+        with open(path, "rb") as f:
+            return parse_ics_content(f.read())
+    else:
+        raise ValueError(f"Unsupported file type: {filename}. Please send a .ics or .zip file.")
+
+
 def events_to_csv(events: list[dict], output_path: str) -> None:
     """Write events to CSV in the format expected by etl.py."""
     with open(output_path, "w", newline="", encoding="utf-8") as f:
@@ -8,17 +8,28 @@ All users authenticate via OAuth (sync_calendar_oauth).
 """
 
 import csv
-import json
+import logging
 import os
 import sqlite3
 from collections import Counter
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
+import lancedb
 from dotenv import load_dotenv
 
+from data_extract import export_to_csv, get_raw_calendar_data_with_creds
+from db import invalidate_vector_cache
+from etl import (
+    load_cache, load_taxonomy, parse_temporal_fields, run_etl,
+    run_pass1_discovery, run_pass2_enrichment, save_cache,
+    upsert_events, upsert_vectors,
+)
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 _DATA_DIR = os.getenv("DATA_DIR", os.path.dirname(__file__))
 
 
@@ -28,21 +39,19 @@ _DATA_DIR = os.getenv("DATA_DIR", os.path.dirname(__file__))
 
 def _raw_to_dicts(raw_events: list[dict]) -> list[dict]:
     """Convert Google Calendar API event objects to flat CSV-row dicts."""
-    fetched = []
-    for event in raw_events:
-        start = event["start"].get("dateTime", event["start"].get("date"))
-        end = event["end"].get("dateTime", event["end"].get("date"))
-        fetched.append({
+    return [
+        {
             "event_id": event.get("id"),
             "summary": event.get("summary", ""),
-            "start_dt": start,
-            "end_dt": end,
+            "start_dt": (start := event["start"]).get("dateTime", start.get("date")),
+            "end_dt": (end := event["end"]).get("dateTime", end.get("date")),
             "description": event.get("description", ""),
             "location": event.get("location", ""),
             "status": event.get("status", ""),
             "last_modified": event.get("updated", ""),
-        })
-    return fetched
+        }
+        for event in raw_events
+    ]
 
 
 def _sync_events(raw_events: list[dict], data_dir: str) -> str:
@@ -51,13 +60,6 @@ def _sync_events(raw_events: list[dict], data_dir: str) -> str:
     Expects the DB and taxonomy to already exist at data_dir.
     Returns a human-readable status message.
     """
-    from etl import (
-        parse_temporal_fields,
-        run_pass1_discovery, run_pass2_enrichment,
-        upsert_events, upsert_vectors,
-    )
-    from db import invalidate_vector_cache
-
     db_file = os.path.join(data_dir, "calendar.db")
     csv_file = os.path.join(data_dir, "calendar_raw_full.csv")
     taxonomy_file = os.path.join(data_dir, "taxonomy.json")
@@ -66,6 +68,10 @@ def _sync_events(raw_events: list[dict], data_dir: str) -> str:
 
     # Check which event_ids already exist in the DB and their last_modified timestamps
     conn = sqlite3.connect(db_file)
+    # Read pages through a memory map with a larger page cache for the full-table scan
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA temp_store=MEMORY")
     existing = {}  # event_id → last_modified
     try:
         cursor = conn.execute("SELECT event_id, last_modified FROM events")
@@ -98,7 +104,7 @@ def _sync_events(raw_events: list[dict], data_dir: str) -> str:
     if not all_ids:
         return "Database is up to date — no new or updated events found."
 
-    print(f"Found {len(new_ids)} new and {len(changed_ids)} updated events to sync")
+    logger.info(f"Found {len(new_ids)} new and {len(changed_ids)} updated events to sync")
 
     # For changed events, invalidate their enrichment caches so they get re-processed
     if changed_ids:
@@ -106,20 +112,15 @@ def _sync_events(raw_events: list[dict], data_dir: str) -> str:
         enrichment_cache_file = os.path.join(data_dir, "enrichment_cache.json")
         for cache_file in [discovery_cache_file, enrichment_cache_file]:
             if os.path.exists(cache_file):
-                import json as _json
-                with open(cache_file) as f:
-                    cache = _json.load(f)
+                cache = load_cache(cache_file)
                 for eid in changed_ids:
                     cache.pop(eid, None)
-                with open(cache_file + ".tmp", "w") as f:
-                    _json.dump(cache, f)
-                os.replace(cache_file + ".tmp", cache_file)
+                save_cache(cache_file, cache)
 
         # Delete old vectors for changed events from LanceDB
-        import lancedb as _lancedb
         vector_dir = os.path.join(data_dir, "calendar_vectors")
         if os.path.exists(vector_dir):
-            ldb = _lancedb.connect(vector_dir)
+            ldb = lancedb.connect(vector_dir)
             if "sub_activities" in ldb.table_names():
                 table = ldb.open_table("sub_activities")
                 ids_str = ", ".join(f"'{eid}'" for eid in changed_ids)
@@ -137,8 +138,7 @@ def _sync_events(raw_events: list[dict], data_dir: str) -> str:
 
     # Enrich and upsert new/changed events only
     # (caches skip already-enriched events automatically)
-    with open(taxonomy_file) as f:
-        taxonomy = json.load(f)
+    taxonomy = load_taxonomy(taxonomy_file)
 
     run_pass1_discovery(new_events, data_dir=data_dir)
     enrichment_cache = run_pass2_enrichment(new_events, taxonomy, data_dir=data_dir)
@@ -166,13 +166,10 @@ def _first_time_sync(raw_events: list[dict], data_dir: str) -> str:
 
     Writes CSV, runs full ETL, and returns a status message.
     """
-    from data_extract import export_to_csv
-    from etl import run_etl
-
     os.makedirs(data_dir, exist_ok=True)
     csv_file = os.path.join(data_dir, "calendar_raw_full.csv")
     export_to_csv(raw_events, csv_file)
-    print(f"Wrote {len(raw_events)} events to {csv_file}")
+    logger.info(f"Wrote {len(raw_events)} events to {csv_file}")
 
     result = run_etl(data_dir)
     return f"Initial sync complete — {len(raw_events)} events imported.\n\n{result}"
@@ -190,8 +187,6 @@ def sync_calendar_oauth(data_dir: str, credentials, calendar_id: str = "primary"
 
     Returns a human-readable status message.
     """
-    from data_extract import get_raw_calendar_data_with_creds
-
     db_file = os.path.join(data_dir, "calendar.db")
     is_first_time = not os.path.exists(db_file)
 
@@ -204,9 +199,9 @@ def sync_calendar_oauth(data_dir: str, credentials, calendar_id: str = "primary"
     else:
         sync_from = (today - timedelta(days=7)).isoformat()
 
-    print(f"OAuth sync from {sync_from} (first_time={is_first_time})")
+    logger.info(f"OAuth sync from {sync_from} (first_time={is_first_time})")
     raw_events = get_raw_calendar_data_with_creds(sync_from, credentials, calendar_id)
-    print(f"Fetched {len(raw_events)} events via OAuth")
+    logger.info(f"Fetched {len(raw_events)} events via OAuth")
 
     if not raw_events:
         return "No events found in your Google Calendar."
@@ -21,27 +21,51 @@ Environment variables (.env):
     TELEGRAM_BOT_TOKEN  — from @BotFather
     TELEGRAM_USER_ID    — admin's numeric Telegram user ID (from @userinfobot)
     WEBHOOK_URL         — (production only) e.g. https://example.up.railway.app/telegram-webhook
+    TELEGRAM_WEBHOOK_SECRET — (production, optional) secret Telegram sends with each webhook call
 """
 
 import asyncio
+import atexit
 import os
+import queue
+import re
+import sys
 import logging
-from datetime import datetime
-
+import multiprocessing
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager, suppress
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from telegram import Update
 from telegram.constants import ParseMode, ChatAction
+from telegram.error import BadRequest
 from telegram.ext import (
+    AIORateLimiter,
     ApplicationBuilder,
     CommandHandler,
     MessageHandler,
     ContextTypes,
     filters,
 )
+from telegram.request import HTTPXRequest
 
-from agent import run_agent, reset_session, invalidate_schema_cache
+from agent import (
+    SESSION_TTL, run_agent, reset_session, invalidate_schema_cache, export_sessions,
+    import_sessions,
+)
+from etl import run_etl_in_worker
+from google_auth import create_auth_url, has_token, load_credentials, oauth_configured
+from ics_parser import events_to_csv, parse_upload_path
+from sync import sync_calendar_oauth
 from user_registry import (
-    ADMIN_USER_ID, load_users, save_users, get_user, get_user_data_dir,
+    ADMIN_USER_ID, add_user, get_user, update_user, get_user_data_dir,
     ensure_admin_registered,
 )
 
@@ -49,14 +73,92 @@ load_dotenv()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
+# Log records are only enqueued on the calling thread (event loop, sync and
+# agent executor threads); a single listener thread does the actual stderr writes.
+_log_queue = queue.SimpleQueue()
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+_log_listener = QueueListener(_log_queue, _log_stream)
+logging.getLogger().addHandler(QueueHandler(_log_queue))
+logging.getLogger().setLevel(logging.INFO)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+
+class _ChatSessions(TTLCache):
+    """chat_id → agent session_id, bounded in size and expiring with the agent's TTL.
+
+    Evicted or expired mappings also drop the agent-side session they point to.
+    """
+
+    def popitem(self):
+        chat_id, session_id = super().popitem()
+        reset_session(session_id)
+        return chat_id, session_id
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for _, session_id in expired:
+            reset_session(session_id)
+        return expired
+
+
 # Map Telegram chat_id → agent session_id
-_chat_sessions: dict[int, str] = {}
+_chat_sessions = _ChatSessions(maxsize=10_000, ttl=SESSION_TTL)
+
+# _chat_sessions (plus the agent history behind it) survives restarts via a
+# write-behind file, flushed at most every few seconds and only after a change
+_SESSIONS_FILE = os.path.join(os.getenv("DATA_DIR", os.path.dirname(__file__)), "chat_sessions.json")
+_SESSIONS_FLUSH_DELAY = 5  # seconds
+_sessions_dirty = asyncio.Event()
+_flush_task: asyncio.Task | None = None
+
+
+def _new_etl_pool() -> ProcessPoolExecutor:
+    # Workers come from a forkserver rather than fork() of this multi-threaded
+    # process, so they don't inherit log handlers, API clients' sockets or the
+    # registry connection
+    return ProcessPoolExecutor(
+        max_workers=max(2, (os.cpu_count() or 2) // 2),
+        mp_context=multiprocessing.get_context("forkserver"),
+    )
+
+
+# ETL is CPU-heavy — run it in worker processes so concurrent /process runs
+# don't serialize on the GIL with each other or with agent queries
+_ETL_POOL = _new_etl_pool()
+
+
+# Per-chat queue of pending text messages and the worker task draining it
+_chat_queues: dict[int, asyncio.Queue] = {}
+_chat_workers: dict[int, asyncio.Task] = {}
+
+# Set by /new to tell an in-flight agent call for that chat to discard its session
+_chat_abort: dict[int, threading.Event] = {}
+
+# Per-user locks so status read-modify-write sequences can't interleave
+_user_locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+async def _set_status(user_id: int, **fields) -> None:
+    """Update a user's registry fields off the event loop, under their lock."""
+    async with _user_locks[user_id]:
+        await asyncio.to_thread(update_user, user_id, **fields)
+
+
+async def _claim_data_dir(user_id: int) -> str | None:
+    """Mark the user "processing" unless a sync or ETL run already holds their data dir.
+
+    Returns the previous status (to restore if the job fails), or None if busy.
+    """
+    async with _user_locks[user_id]:
+        # Re-read under the lock so two jobs can't both start
+        status = get_user(user_id).get("status", "registered")
+        if status == "processing":
+            return None
+        await asyncio.to_thread(update_user, user_id, status="processing")
+        return status
 
 
 # ──────────────────────────────────────────────
@@ -68,33 +170,92 @@ def _split_message(text: str, limit: int = 4096) -> list[str]:
     if len(text) <= limit:
         return [text]
 
+    # Walk the string by index so the remaining tail is never re-sliced
     chunks = []
-    while text:
-        if len(text) <= limit:
-            chunks.append(text)
+    start, n = 0, len(text)
+    while start < n:
+        if n - start <= limit:
+            chunks.append(text[start:])
             break
+        end = start + limit
         # Find the last double newline within the limit
-        split_at = text.rfind("\n\n", 0, limit)
-        if split_at == -1:
+        split_at = text.rfind("\n\n", start, end)
+        if split_at <= start:
             # Fall back to single newline
-            split_at = text.rfind("\n", 0, limit)
-        if split_at == -1:
+            split_at = text.rfind("\n", start, end)
+        if split_at <= start:
             # Fall back to hard cut
-            split_at = limit
-        chunks.append(text[:split_at])
-        text = text[split_at:].lstrip("\n")
+            split_at = end
+        chunks.append(text[start:split_at])
+        start = split_at
+        while start < n and text[start] == "\n":
+            start += 1
     return chunks
 
 
+# Code spans/blocks — their contents are literal in Telegram's legacy Markdown
+_MD_CODE = re.compile(r"```.*?```|`[^`\n]*`", re.DOTALL)
+
+
+def _markdown_safe(chunk: str) -> bool:
+    """Cheap check that legacy Markdown entities in chunk are balanced."""
+    if "`" in chunk:
+        if chunk.count("```") % 2:
+            return False
+        rest = _MD_CODE.sub("", chunk)
+    else:
+        # No code spans — skip the regex pass entirely
+        rest = chunk
+    return "`" not in rest and rest.count("*") % 2 == 0 and rest.count("_") % 2 == 0
+
+
 async def _send_long(update: Update, text: str) -> None:
-    """Send a message, splitting if needed. Try Markdown, fall back to plain text."""
-    for chunk in _split_message(text):
-        try:
-            await update.message.reply_text(
-                chunk, parse_mode=ParseMode.MARKDOWN
-            )
-        except Exception:
-            await update.message.reply_text(chunk)
+    """Send a message, splitting if needed. Use Markdown when it will parse, else plain text.
+
+    Chunks go out sequentially — Telegram only preserves order for sequential
+    sends — but only the first one triggers a notification. Once Telegram rejects
+    the Markdown of one chunk, the rest of the response is sent as plain text.
+    """
+    use_markdown = True
+    for i, chunk in enumerate(_split_message(text)):
+        quiet = i > 0
+        if use_markdown and _markdown_safe(chunk):
+            try:
+                await update.message.reply_text(
+                    chunk, parse_mode=ParseMode.MARKDOWN, disable_notification=quiet
+                )
+                continue
+            except BadRequest as e:
+                # Only a Markdown rejection is worth a plain-text retry
+                if "can't parse entities" not in str(e).lower():
+                    raise
+                use_markdown = False
+        await update.message.reply_text(chunk, disable_notification=quiet)
+
+
+@asynccontextmanager
+async def _typing(update: Update):
+    """Show "typing..." for the duration of the block.
+
+    Telegram clears the indicator after ~5s, so it's re-sent every 4s until the
+    block exits. Only wrap real work — fast paths shouldn't pay for the extra call.
+    """
+    stop = asyncio.Event()
+
+    async def _keep_typing():
+        while not stop.is_set():
+            await update.message.reply_chat_action(ChatAction.TYPING)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=4)
+            except asyncio.TimeoutError:
+                pass
+
+    task = asyncio.create_task(_keep_typing())
+    try:
+        yield
+    finally:
+        stop.set()
+        task.cancel()
 
 
 # ──────────────────────────────────────────────
@@ -130,29 +291,20 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def cmd_register(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    user_id_str = str(user_id)
-    users = load_users()
-
-    if user_id_str in users:
-        await update.message.reply_text(
-            "You're already registered! Send /status to see what's next."
-        )
-        return
 
-    # Create user entry + data directory
-    data_dir = get_user_data_dir(user_id)
-    os.makedirs(data_dir, exist_ok=True)
+    async with _user_locks[user_id]:
+        if get_user(user_id):
+            await update.message.reply_text(
+                "You're already registered! Send /status to see what's next."
+            )
+            return
 
-    users[user_id_str] = {
-        "name": update.effective_user.first_name or "User",
-        "status": "registered",
-        "registered_at": datetime.now().isoformat(),
-    }
-    save_users(users)
+        # Create user entry + data directory
+        get_user_data_dir(user_id)
+        name = update.effective_user.first_name or "User"
+        await asyncio.to_thread(add_user, user_id, name)
 
     # Auto-trigger OAuth flow if configured
-    from google_auth import oauth_configured, create_auth_url
-
     if oauth_configured():
         try:
             chat_id = update.effective_chat.id
@@ -173,6 +325,32 @@ async def cmd_register(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         )
 
 
+_STATUS_TEMPLATES = {
+    "registered": (
+        "Hi {name}! You're registered but haven't connected your calendar yet.\n\n"
+        "Next step: Send /sync to connect your Google Calendar."
+    ),
+    "data_uploaded": (
+        "Hi {name}! Your calendar data is uploaded "
+        "({event_count} events found).\n\n"
+        "Next step: Send /process to analyze your data."
+    ),
+    "processing": (
+        "Hi {name}! Your data is currently being processed. "
+        "This can take several minutes — I'll let you know when it's done."
+    ),
+    "ready": (
+        "Hi {name}! Your data is ready. Ask me anything about your calendar!\n\n"
+        "Use /sync to update your calendar data."
+    ),
+    "error": (
+        "Hi {name}! There was an error processing your data.\n"
+        "Error: {error}\n\n"
+        "Try /sync to reconnect your calendar, or contact support."
+    ),
+}
+
+
 async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = get_user(update.effective_user.id)
     if not user:
@@ -182,38 +360,20 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     status = user.get("status", "registered")
     name = user.get("name", "User")
 
-    status_messages = {
-        "registered": (
-            f"Hi {name}! You're registered but haven't connected your calendar yet.\n\n"
-            "Next step: Send /sync to connect your Google Calendar."
-        ),
-        "data_uploaded": (
-            f"Hi {name}! Your calendar data is uploaded "
-            f"({user.get('event_count', '?')} events found).\n\n"
-            "Next step: Send /process to analyze your data."
-        ),
-        "processing": (
-            f"Hi {name}! Your data is currently being processed. "
-            "This can take several minutes — I'll let you know when it's done."
-        ),
-        "ready": (
-            f"Hi {name}! Your data is ready. Ask me anything about your calendar!\n\n"
-            "Use /sync to update your calendar data."
-        ),
-        "error": (
-            f"Hi {name}! There was an error processing your data.\n"
-            f"Error: {user.get('error', 'Unknown')}\n\n"
-            "Try /sync to reconnect your calendar, or contact support."
-        ),
-    }
-    msg = status_messages.get(status, f"Status: {status}")
+    tmpl = _STATUS_TEMPLATES.get(status)
+    if tmpl:
+        msg = tmpl.format(
+            name=name,
+            event_count=user.get("event_count", "?"),
+            error=user.get("error", "Unknown"),
+        )
+    else:
+        msg = f"Status: {status}"
 
     # Show Google Calendar connection status
-    from google_auth import oauth_configured, get_token_path
     data_dir = get_user_data_dir(update.effective_user.id)
     if oauth_configured():
-        token_path = get_token_path(data_dir)
-        if os.path.exists(token_path):
+        if has_token(data_dir):
             msg += "\n\nGoogle Calendar: connected (OAuth)"
         else:
             msg += "\n\nGoogle Calendar: not connected — send /sync to link your account"
@@ -226,9 +386,20 @@ async def cmd_new(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not user:
         return
     chat_id = update.effective_chat.id
+
+    # Abort any in-flight agent call so it can't re-store the old session afterwards
+    abort = _chat_abort.pop(chat_id, None)
+    if abort:
+        abort.set()
+    worker = _chat_workers.pop(chat_id, None)
+    if worker:
+        worker.cancel()
+    _chat_queues.pop(chat_id, None)
+
     old_sid = _chat_sessions.pop(chat_id, None)
     if old_sid:
         reset_session(old_sid)
+        _sessions_dirty.set()
     await update.message.reply_text("Session reset. Ask me anything!")
 
 
@@ -242,8 +413,6 @@ async def cmd_sync(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     data_dir = get_user_data_dir(user_id)
 
-    from google_auth import load_credentials, oauth_configured, create_auth_url
-
     if not oauth_configured():
         await update.message.reply_text(
             "Google Calendar sync isn't configured yet.\n\n"
@@ -253,25 +422,25 @@ async def cmd_sync(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     creds = load_credentials(data_dir)
     if creds:
-        # Already authorized — sync directly
-        await update.message.reply_chat_action(ChatAction.TYPING)
+        # Already authorized — sync directly, holding the data dir against
+        # /process, uploads and a second /sync (a first sync runs the full ETL)
+        previous_status = await _claim_data_dir(user_id)
+        if previous_status is None:
+            await update.message.reply_text("Already syncing or processing your data. Please wait...")
+            return
         await update.message.reply_text("Syncing your calendar...")
         try:
-            from sync import sync_calendar_oauth
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None, lambda: sync_calendar_oauth(data_dir, creds)
-            )
-            invalidate_schema_cache(data_dir)
-
-            users = load_users()
-            users[str(user_id)]["status"] = "ready"
-            save_users(users)
-
-            await update.message.reply_text(result)
+            async with _typing(update):
+                result = await asyncio.to_thread(sync_calendar_oauth, data_dir, creds)
         except Exception as e:
             logger.exception("OAuth sync failed")
+            await _set_status(user_id, status=previous_status)
             await update.message.reply_text(f"Sync failed: {e}")
+            return
+        invalidate_schema_cache(data_dir)
+        await _set_status(user_id, status="ready")
+
+        await update.message.reply_text(result)
     else:
         # No token yet — send OAuth link
         try:
@@ -287,6 +456,14 @@ async def cmd_sync(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             await update.message.reply_text(f"Error: {e}")
 
 
+def _replace_etl_pool(broken: ProcessPoolExecutor) -> None:
+    """Swap in a fresh ETL pool, unless a concurrent /process already replaced this one."""
+    global _ETL_POOL
+    if _ETL_POOL is broken:
+        _ETL_POOL = _new_etl_pool()
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
 async def cmd_process(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Run ETL pipeline on user's uploaded calendar data."""
     user_id = update.effective_user.id
@@ -305,50 +482,47 @@ async def cmd_process(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         )
         return
 
-    if user.get("status") == "processing":
+    if await _claim_data_dir(user_id) is None:
         await update.message.reply_text("Already processing your data. Please wait...")
         return
 
-    # Update status
-    users = load_users()
-    users[str(user_id)]["status"] = "processing"
-    save_users(users)
-
     await update.message.reply_text(
         "Starting data processing... This may take several minutes.\n"
         "I'll message you when it's done."
     )
 
     try:
-        from etl import run_etl
-
-        # Run ETL in a thread to avoid blocking the event loop
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, lambda: run_etl(data_dir))
+        # Run ETL in a worker process to avoid blocking the event loop
+        pool = _ETL_POOL
+        result = await asyncio.get_running_loop().run_in_executor(pool, run_etl_in_worker, data_dir)
 
         # Invalidate caches so next query sees the new data
         invalidate_schema_cache(data_dir)
 
-        users = load_users()
-        users[str(user_id)]["status"] = "ready"
-        save_users(users)
-
-        await _send_long(update, f"{result}\n\nAsk me anything about your calendar!")
+        # Status write and the Telegram reply are independent — overlap them
+        await asyncio.gather(
+            _set_status(user_id, status="ready"),
+            _send_long(update, f"{result}\n\nAsk me anything about your calendar!"),
+        )
 
     except Exception as e:
-        users = load_users()
-        users[str(user_id)]["status"] = "error"
-        users[str(user_id)]["error"] = str(e)
-        save_users(users)
-
         logger.exception("ETL failed")
-        await update.message.reply_text(f"Processing failed: {e}")
+        if isinstance(e, BrokenProcessPool):
+            # A worker died (e.g. OOM-killed); replace the pool so later runs still work
+            _replace_etl_pool(pool)
+        await asyncio.gather(
+            _set_status(user_id, status="error", error=str(e)),
+            update.message.reply_text(f"Processing failed: {e}"),
+        )
 
 
 # ──────────────────────────────────────────────
 # File upload handler (ICS/ZIP calendar exports)
 # ──────────────────────────────────────────────
 
+_BUSY_UPLOAD_REPLY = "Your data is being synced or processed right now. Please send the file again once it's done."
+
+
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle uploaded .ics or .zip calendar export files."""
     user_id = update.effective_user.id
@@ -370,41 +544,51 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return
 
-    await update.message.reply_chat_action(ChatAction.TYPING)
-
-    # Download file from Telegram
-    try:
-        file = await context.bot.get_file(doc.file_id)
-        file_bytes = await file.download_as_bytearray()
-    except Exception as e:
-        await update.message.reply_text(f"Error downloading file: {e}")
+    if user.get("status") == "processing":
+        await update.message.reply_text(_BUSY_UPLOAD_REPLY)
         return
 
-    # Parse the calendar file
-    try:
-        from ics_parser import parse_upload, events_to_csv
+    data_dir = get_user_data_dir(user_id)
+    upload_path = os.path.join(data_dir, f".upload.{uuid.uuid4().hex}")
 
-        events = parse_upload(bytes(file_bytes), filename)
-    except Exception as e:
-        logger.exception("ICS parse failed")
-        await update.message.reply_text(f"Error parsing calendar file: {e}")
-        return
+    try:
+        # One typing indicator spans both the download and the parse
+        async with _typing(update):
+            # Stream the file from Telegram to disk instead of buffering it in memory
+            try:
+                file = await context.bot.get_file(doc.file_id)
+                await file.download_to_drive(upload_path)
+            except Exception as e:
+                await update.message.reply_text(f"Error downloading file: {e}")
+                return
+
+            # Parse the calendar file
+            try:
+                events = await asyncio.to_thread(parse_upload_path, upload_path, filename)
+            except Exception as e:
+                logger.exception("ICS parse failed")
+                await update.message.reply_text(f"Error parsing calendar file: {e}")
+                return
+    finally:
+        with suppress(FileNotFoundError):
+            os.remove(upload_path)
 
     if not events:
         await update.message.reply_text("No calendar events found in the file.")
         return
 
-    # Save as CSV in user's data directory
-    data_dir = get_user_data_dir(user_id)
-    os.makedirs(data_dir, exist_ok=True)
-    csv_path = os.path.join(data_dir, "calendar_raw_full.csv")
-    events_to_csv(events, csv_path)
+    async with _user_locks[user_id]:
+        # A sync or ETL run may have started during the download; don't swap its CSV out
+        if get_user(user_id).get("status") == "processing":
+            await update.message.reply_text(_BUSY_UPLOAD_REPLY)
+            return
 
-    # Update user status
-    users = load_users()
-    users[str(user_id)]["status"] = "data_uploaded"
-    users[str(user_id)]["event_count"] = len(events)
-    save_users(users)
+        # Save as CSV in user's data directory
+        csv_path = os.path.join(data_dir, "calendar_raw_full.csv")
+        await asyncio.to_thread(events_to_csv, events, csv_path)
+
+        # Update user status
+        await asyncio.to_thread(update_user, user_id, status="data_uploaded", event_count=len(events))
 
     await update.message.reply_text(
         f"Calendar data received! {len(events):,} events found.\n\n"
@@ -441,21 +625,132 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     chat_id = update.effective_chat.id
-    question = update.message.text
     data_dir = get_user_data_dir(user_id)
 
-    # Show "typing..." while processing
-    await update.message.reply_chat_action(ChatAction.TYPING)
+    # Queue the question; a single worker per chat answers queued messages in order
+    pending = _chat_queues.setdefault(chat_id, asyncio.Queue())
+    pending.put_nowait(update)
+    worker = _chat_workers.get(chat_id)
+    if worker is None or worker.done():
+        _chat_workers[chat_id] = asyncio.create_task(_drain_chat(chat_id, data_dir))
 
-    session_id = _chat_sessions.get(chat_id)
 
+async def _drain_chat(chat_id: int, data_dir: str) -> None:
+    """Answer queued messages for a chat, merging any that piled up into one question."""
+    pending = _chat_queues[chat_id]
     try:
+        while not pending.empty():
+            # Rapid-fire follow-ups sent while the agent was busy become one prompt
+            batch = [pending.get_nowait() for _ in range(pending.qsize())]
+            question = "\n".join(u.message.text for u in batch)
+            await _answer(batch[-1], chat_id, question, data_dir)
+    finally:
+        # /new may already have replaced this worker — only unregister ourselves
+        if _chat_workers.get(chat_id) is asyncio.current_task():
+            del _chat_workers[chat_id]
+
+
+async def _answer(update: Update, chat_id: int, question: str, data_dir: str) -> None:
+    session_id = _chat_sessions.get(chat_id)
+    abort = _chat_abort[chat_id] = threading.Event()
+
+    def _run():
         result = run_agent(question, session_id, data_dir=data_dir)
+        if abort.is_set():
+            # /new arrived mid-call — drop the session this call touched
+            reset_session(result["session_id"])
+        return result
+
+    try:
+        # Show "typing..." while the agent works
+        async with _typing(update):
+            result = await asyncio.to_thread(_run)
+        if abort.is_set():
+            return
         _chat_sessions[chat_id] = result["session_id"]
+        _sessions_dirty.set()
         await _send_long(update, result["answer"])
     except Exception as e:
         logger.exception("Agent error")
         await update.message.reply_text(f"Error: {e}")
+    finally:
+        if _chat_abort.get(chat_id) is abort:
+            del _chat_abort[chat_id]
+
+
+# ──────────────────────────────────────────────
+# Session persistence
+# ──────────────────────────────────────────────
+
+def _load_chat_sessions() -> None:
+    """Restore chat → session mappings (and their history) saved by a previous run.
+
+    A missing or unreadable file (e.g. truncated by a crash) just means starting fresh.
+    """
+    try:
+        with open(_SESSIONS_FILE, "rb") as f:
+            data = orjson.loads(f.read())
+        chats = {int(cid): sid for cid, sid in data.get("chats", {}).items()}
+        import_sessions(data.get("sessions", {}))
+    except FileNotFoundError:
+        return
+    except Exception:
+        logger.exception(f"Could not restore chat sessions from {_SESSIONS_FILE}; starting with none")
+        return
+    _chat_sessions.update(chats)
+    logger.info(f"Restored {len(_chat_sessions)} chat sessions from {_SESSIONS_FILE}")
+
+
+def _snapshot_chat_sessions() -> dict:
+    _chat_sessions.expire()
+    return {
+        "chats": {str(cid): sid for cid, sid in _chat_sessions.items()},
+        "sessions": export_sessions(_chat_sessions.values()),
+    }
+
+
+def _write_chat_sessions(data: dict) -> None:
+    tmp = _SESSIONS_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(data))
+    os.replace(tmp, _SESSIONS_FILE)
+
+
+async def _flush_chat_sessions() -> None:
+    """Background task: persist sessions a few seconds after they change."""
+    while True:
+        await _sessions_dirty.wait()
+        await asyncio.sleep(_SESSIONS_FLUSH_DELAY)
+        _sessions_dirty.clear()
+        try:
+            # Snapshot on the loop thread; only the file write goes to the executor
+            data = _snapshot_chat_sessions()
+            await asyncio.to_thread(_write_chat_sessions, data)
+        except Exception:
+            # Keep the task alive; the next change retries the write
+            logger.exception("Failed to persist chat sessions")
+
+
+async def _post_init(app) -> None:
+    global _flush_task
+    loop = asyncio.get_running_loop()
+    # Agent calls, syncs and registry writes all share the default executor;
+    # the stock cpu+4 workers is too few for several chats at once.
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=min(32, max(8, (os.cpu_count() or 1) * 4))))
+    # Run handler tasks eagerly so ones that never await (/start, rejects)
+    # skip a scheduler round-trip. eager_task_factory is Python 3.12+.
+    eager_factory = getattr(asyncio, "eager_task_factory", None)
+    if eager_factory is not None:
+        loop.set_task_factory(eager_factory)
+    _load_chat_sessions()
+    # Plain asyncio task: Application.stop() would wait forever on a create_task() loop
+    _flush_task = asyncio.create_task(_flush_chat_sessions())
+
+
+async def _post_shutdown(app) -> None:
+    if _flush_task:
+        _flush_task.cancel()
+    _write_chat_sessions(_snapshot_chat_sessions())
 
 
 # ──────────────────────────────────────────────
@@ -463,28 +758,56 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 # ──────────────────────────────────────────────
 
 def _register_handlers(app):
-    """Register all Telegram handlers on the given Application."""
-    app.add_handler(CommandHandler("start", cmd_start))
-    app.add_handler(CommandHandler("register", cmd_register))
-    app.add_handler(CommandHandler("status", cmd_status))
-    app.add_handler(CommandHandler("new", cmd_new))
-    app.add_handler(CommandHandler("sync", cmd_sync))
-    app.add_handler(CommandHandler("process", cmd_process))
-    app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    """Register all Telegram handlers on the given Application.
+
+    Handlers run with block=False so a slow /sync or /process for one chat
+    doesn't hold up dispatch for everyone else. Per-user state changes are
+    serialized by _user_locks and text messages by the per-chat queue.
+    """
+    app.add_handler(CommandHandler("start", cmd_start, block=False))
+    app.add_handler(CommandHandler("register", cmd_register, block=False))
+    app.add_handler(CommandHandler("status", cmd_status, block=False))
+    app.add_handler(CommandHandler("new", cmd_new, block=False))
+    app.add_handler(CommandHandler("sync", cmd_sync, block=False))
+    app.add_handler(CommandHandler("process", cmd_process, block=False))
+    app.add_handler(MessageHandler(filters.Document.ALL, handle_document, block=False))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message, block=False))
 
 
-def create_webhook_application():
-    """Create Telegram Application in webhook mode (no polling updater).
+def _application_builder() -> ApplicationBuilder:
+    """ApplicationBuilder with a larger connection pool for concurrent handlers.
 
-    Used by api.py when running under Uvicorn in production.
+    PTB's default pool is small; with many users awaiting get_file, downloads,
+    and replies at once, connections would otherwise be torn down and re-opened.
     """
-    ptb = (
+    request = HTTPXRequest(
+        connection_pool_size=64,
+        read_timeout=45,
+        connect_timeout=10,
+        pool_timeout=5,
+    )
+    # Queue bursts client-side under Telegram's flood limits instead of eating 429 backoffs.
+    # 28/s leaves headroom below the 30/s bot-wide cap for multi-chunk answers.
+    return (
         ApplicationBuilder()
         .token(TELEGRAM_BOT_TOKEN)
-        .updater(None)
-        .build()
+        .request(request)
+        .rate_limiter(AIORateLimiter(overall_max_rate=28, overall_time_period=1, max_retries=3))
+        # Dispatch up to 256 updates at once; per-chat order is kept by _chat_queues
+        .concurrent_updates(256)
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
     )
+
+
+def create_webhook_application():
+    """Create Telegram Application in webhook mode (no polling updater).
+
+    Used by api.py when running under Uvicorn in production. PTB only runs the
+    post_init/post_shutdown hooks itself in run_polling/run_webhook, so the
+    caller must await them around initialize()/shutdown().
+    """
+    ptb = _application_builder().updater(None).build()
     _register_handlers(ptb)
     return ptb
 
@@ -495,7 +818,6 @@ def create_webhook_application():
 
 def _start_web_server():
     """Start uvicorn in a daemon thread for the OAuth callback endpoint."""
-    import threading
     import uvicorn
     from api import app as web_app
 
@@ -510,6 +832,15 @@ def _start_web_server():
 
 
 def main():
+    # uvloop speeds up the asyncio event loop; must be installed before the
+    # Application is built. Not available on Windows, so it stays optional.
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
     if not TELEGRAM_BOT_TOKEN:
         print("Error: TELEGRAM_BOT_TOKEN not set in .env")
         return
@@ -520,18 +851,28 @@ def main():
     # Auto-register admin user
     ensure_admin_registered()
 
-    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    # Long-poll read timeout needs headroom over the 30s getUpdates window below
+    app = (
+        _application_builder()
+        .get_updates_request(HTTPXRequest(read_timeout=45, connect_timeout=10))
+        .build()
+    )
     _register_handlers(app)
 
     # Start the web server for OAuth callbacks (only if OAuth is configured)
-    from google_auth import oauth_configured
     if oauth_configured():
         from api import set_telegram_bot
         set_telegram_bot(app.bot)
         _start_web_server()
 
     print("Bot starting in polling mode (multi-user)...")
-    app.run_polling()
+    # The bot only handles messages (text + documents) — skip every other update type
+    app.run_polling(
+        timeout=30,
+        poll_interval=0.0,
+        allowed_updates=[Update.MESSAGE],
+        drop_pending_updates=False,
+    )
 
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from datetime import datetime
-from anthropic import Anthropic
-import json
+from datetime import date, datetime, timedelta
+import calendar
+import functools
+import orjson
+import re
 from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 import os
@@ -17,11 +17,27 @@ ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 YOUR_TIMEZONE = os.getenv('YOUR_TIMEZONE')
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
-# Initialize APIs
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-calendar_service = build('calendar', 'v3', credentials=credentials)
-claude_client = Anthropic(api_key=ANTHROPIC_API_KEY)
+# API clients are built on first use so startup doesn't pay for the
+# googleapiclient/anthropic imports before the first question
+_calendar_service = None
+_claude_client = None
+
+def get_calendar_service():
+    global _calendar_service
+    if _calendar_service is None:
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+        credentials = service_account.Credentials.from_service_account_file(
+            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        _calendar_service = build('calendar', 'v3', credentials=credentials)
+    return _calendar_service
+
+def get_claude_client():
+    global _claude_client
+    if _claude_client is None:
+        from anthropic import Anthropic
+        _claude_client = Anthropic(api_key=ANTHROPIC_API_KEY)
+    return _claude_client
 
 def get_calendar_events(start_date, end_date):
     """Fetch ALL events between start_date and end_date in your local timezone"""
@@ -43,14 +59,16 @@ def get_calendar_events(start_date, end_date):
     page_token = None
     
     while True:
-        events_result = calendar_service.events().list(
+        events_result = get_calendar_service().events().list(
             calendarId=CALENDAR_ID,
             timeMin=time_min,
             timeMax=time_max,
             maxResults=2500,  # Max allowed per request
             singleEvents=True,
             orderBy='startTime',
-            pageToken=page_token
+            pageToken=page_token,
+            # Only the fields ask_claude_to_answer reads
+            fields='items(start,summary,description),nextPageToken'
         ).execute()
         
         events = events_result.get('items', [])
@@ -65,9 +83,59 @@ def get_calendar_events(start_date, end_date):
     
     return all_events
 
+def _months_back(day, months):
+    """Same day-of-month `months` earlier, clamped to the end of shorter months"""
+    total = day.year * 12 + day.month - 1 - months
+    year, month = divmod(total, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+_AGO = re.compile(r'\b(\d+)\s*(day|week|month|year)s?\s+ago\b')
+_RELATIVE = re.compile(r'\b(?:today last year|yesterday|today|tomorrow|last week|\d+\s*(?:day|week|month|year)s?\s+ago)\b')
+_RANGE_CUE = re.compile(r'\b(?:between|since|until|from|to|through|and|before|after)\b|-')
+
+def parse_date_range_locally(user_query, today):
+    """Handle common relative phrases without an API call; returns None if unsure"""
+    query = user_query.lower()
+    # Only a single relative day/period is safe to resolve here; anything that
+    # looks like a range ("since 2 months ago", "between X and today") goes to Claude
+    if len(_RELATIVE.findall(query)) != 1 or _RANGE_CUE.search(query):
+        return None
+    day = date.fromisoformat(today)
+
+    if 'today last year' in query:
+        start = end = _months_back(day, 12)
+    elif re.search(r'\byesterday\b', query):
+        start = end = day - timedelta(days=1)
+    elif re.search(r'\btoday\b', query):
+        start = end = day
+    elif re.search(r'\blast week\b', query):
+        start, end = day - timedelta(days=7), day - timedelta(days=1)
+    elif match := _AGO.search(query):
+        n, unit = int(match.group(1)), match.group(2)
+        if unit == 'day':
+            start = end = day - timedelta(days=n)
+        elif unit == 'week':
+            start = end = day - timedelta(weeks=n)
+        else:
+            start = end = _months_back(day, n * 12 if unit == 'year' else n)
+    else:
+        return None
+
+    return {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+@functools.lru_cache(maxsize=1024)
+def _cached_date_range(user_query, today):
+    return parse_date_range_locally(user_query, today) or _ask_claude(user_query, today)
+
 def ask_claude_for_date_range(user_query, today):
+    """Extract the date range from user query, only asking Claude for phrases we can't parse"""
+    # Copy so callers can't mutate the cached dict
+    return dict(_cached_date_range(user_query, today))
+
+def _ask_claude(user_query, today):
     """Ask Claude to extract the date range from user query"""
-    response = claude_client.messages.create(
+    response = get_claude_client().messages.create(
         model="claude-sonnet-4-20250514",
         max_tokens=1000,
         messages=[{
@@ -90,7 +158,7 @@ Examples:
     
     # Extract JSON from Claude's response
     response_text = response.content[0].text
-    return json.loads(response_text)
+    return orjson.loads(response_text)
 
 def ask_claude_to_answer(user_query, events, date_range):
     """Give Claude the events and ask it to answer the user's question"""
@@ -111,7 +179,7 @@ def ask_claude_to_answer(user_query, events, date_range):
     tz = ZoneInfo(YOUR_TIMEZONE)
     today = datetime.now(tz).strftime('%Y-%m-%d')
     
-    response = claude_client.messages.create(
+    response = get_claude_client().messages.create(
         model="claude-sonnet-4-20250514",
         max_tokens=1000,
         messages=[{
@@ -2,132 +2,319 @@
 
 from __future__ import annotations
 
-import json
+import errno
+import functools
+import logging
 import os
 import shutil
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import MappingProxyType
 
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 ADMIN_USER_ID = int(os.getenv("TELEGRAM_USER_ID", "0"))
 _DATA_DIR = os.getenv("DATA_DIR", os.path.dirname(__file__))
-USERS_FILE = os.path.join(_DATA_DIR, "users.json")
+USERS_FILE = os.path.join(_DATA_DIR, "users.json")  # legacy store, imported into USERS_DB once
+USERS_DB = os.path.join(_DATA_DIR, "users.db")
+_USERS_DIR = os.path.join(_DATA_DIR, "users")  # parent of every per-user data dir
+
+_USER_FIELDS = ("name", "status", "registered_at", "event_count", "error")
+
+# Single connection for the process lifetime; the lock serializes access across
+# the event loop and the OAuth background sync thread.
+_conn: sqlite3.Connection | None = None
+_conn_lock = threading.Lock()
+
+# In-memory copy of the users table, reloaded only when another connection
+# commits (PRAGMA data_version changes). Writes here update it in place.
+# Each user is a read-only view that writes replace rather than mutate, so
+# get_user can hand it out without a defensive copy.
+_users: dict[int, Mapping] | None = None
+_users_version: int | None = None
+# Our own writes refresh the cache directly, so data_version only matters for
+# other processes; probing it at most once a second is plenty
+_VERSION_CHECK_INTERVAL = 1.0
+_users_checked_at = 0.0
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(USERS_DB, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id       INTEGER PRIMARY KEY,
+                name          TEXT,
+                status        TEXT,
+                registered_at TEXT,
+                event_count   INTEGER,
+                error         TEXT
+            )
+        """)
+        _import_users_json(conn)
+        _conn = conn
+    return _conn
+
+
+def _import_users_json(conn: sqlite3.Connection) -> None:
+    """One-time migration: copy legacy users.json rows into users.db."""
+    if not os.path.exists(USERS_FILE):
+        return
+    with open(USERS_FILE, "rb") as f:
+        users = orjson.loads(f.read())
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (user_id, name, status, registered_at, event_count, error) "
+            "VALUES (?,?,?,?,?,?)",
+            [
+                (int(uid), *(u.get(field) for field in _USER_FIELDS))
+                for uid, u in users.items()
+            ],
+        )
+    os.replace(USERS_FILE, USERS_FILE + ".migrated")
+    logger.info("[users] Imported %d users from %s into %s", len(users), USERS_FILE, USERS_DB)
+
+
+def _row_to_user(row: sqlite3.Row) -> Mapping:
+    # Unset columns are dropped so callers keep using user.get(key, default)
+    return MappingProxyType({k: row[k] for k in _USER_FIELDS if row[k] is not None})
 
 
-def load_users() -> dict:
-    if os.path.exists(USERS_FILE):
-        with open(USERS_FILE) as f:
-            return json.load(f)
-    return {}
+def _cached_users(conn: sqlite3.Connection) -> dict[int, Mapping]:
+    """Return the cached users table, reloading it if another connection wrote to it."""
+    global _users, _users_version, _users_checked_at
+    now = time.monotonic()
+    if _users is not None and now - _users_checked_at < _VERSION_CHECK_INTERVAL:
+        return _users
+    _users_checked_at = now
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if _users is None or version != _users_version:
+        _users = {row["user_id"]: _row_to_user(row) for row in conn.execute("SELECT * FROM users")}
+        _users_version = version
+    return _users
 
 
-def save_users(users: dict) -> None:
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2)
+def _refresh_user(conn: sqlite3.Connection, user_id: int) -> None:
+    """Re-read one row into the cache after a write on our own connection."""
+    users = _cached_users(conn)
+    row = conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    if row:
+        users[user_id] = _row_to_user(row)
 
 
-def get_user(user_id: int) -> dict | None:
-    users = load_users()
-    return users.get(str(user_id))
+def get_user(user_id: int) -> Mapping | None:
+    """Return a read-only view of the user's fields; change them with update_user."""
+    with _conn_lock:
+        return _cached_users(_get_conn()).get(user_id)
 
 
+def add_user(user_id: int, name: str, status: str = "registered") -> None:
+    """Register a new user (no-op if the user already exists)."""
+    with _conn_lock:
+        conn = _get_conn()
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO users (user_id, name, status, registered_at) VALUES (?,?,?,?)",
+                (user_id, name, status, datetime.now().isoformat()),
+            )
+        if cursor.rowcount:
+            _refresh_user(conn, user_id)
+
+
+def update_user(user_id: int, **fields) -> bool:
+    """Update columns for an existing user. Returns False if the user isn't registered."""
+    unknown = set(fields) - set(_USER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown user fields: {', '.join(sorted(unknown))}")
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    with _conn_lock:
+        conn = _get_conn()
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE users SET {assignments} WHERE user_id = ?",
+                (*fields.values(), user_id),
+            )
+        if cursor.rowcount:
+            _refresh_user(conn, user_id)
+    return cursor.rowcount > 0
+
+
+@functools.lru_cache(maxsize=1024)
 def get_user_data_dir(user_id: int) -> str:
-    """Return per-user data directory: data/users/{user_id}/."""
-    return os.path.join(_DATA_DIR, "users", str(user_id))
+    """Return per-user data directory: data/users/{user_id}/, creating it on first use."""
+    path = _USERS_DIR + os.sep + str(user_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# Read/write chunk for the cross-device copy fallback (shutil's default is 64 KiB;
+# Linux uses sendfile and ignores it, elsewhere a bigger chunk copies DBs faster)
+_COPY_BUFSIZE = 1 << 20
+
+
+# Parallel file copies when a directory (calendar_vectors/) has to cross devices
+_COPY_WORKERS = 8
+
+
+def _copytree_parallel(src: str, dst: str) -> None:
+    """Copy a directory tree with per-file copies spread over a thread pool, then remove src.
+
+    copytree still creates the directories in order; only the file copies, which
+    release the GIL inside sendfile/read/write, run concurrently.
+    """
+    with ThreadPoolExecutor(max_workers=_COPY_WORKERS) as pool:
+        futures = []
+        shutil.copytree(
+            src, dst,
+            copy_function=lambda s, d: futures.append(pool.submit(shutil.copy2, s, d)),
+        )
+        for future in futures:
+            future.result()
+    shutil.rmtree(src)
+
+
+def _move(src: str, dst: str) -> None:
+    """rename(2) when src and dst share a filesystem; copy + delete only across devices."""
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        bufsize = shutil.COPY_BUFSIZE
+        shutil.COPY_BUFSIZE = max(bufsize, _COPY_BUFSIZE)
+        try:
+            if os.path.islink(src):
+                shutil.move(src, dst)
+            elif os.path.isdir(src):
+                _copytree_parallel(src, dst)
+            else:
+                # copyfile goes straight to sendfile(2) on Linux (fcopyfile on
+                # macOS), keeping DB bytes in the kernel; then drop the source
+                shutil.copyfile(src, dst)
+                shutil.copystat(src, dst)
+                os.unlink(src)
+        finally:
+            shutil.COPY_BUFSIZE = bufsize
+
+
+# Legacy single-user files that lived directly in _DATA_DIR
+_MIGRATE_FILES = (
+    "calendar_raw_full.csv",
+    "calendar.db",
+    "calendar_events.db",
+    "taxonomy.json",
+    "discovery_cache.json",
+    "enrichment_cache.json",
+    "google_token.json",
+)
+_MIGRATE_DIRS = ("calendar_vectors",)
+_MIGRATE_ALL = _MIGRATE_FILES + _MIGRATE_DIRS
+
+# Written into the admin's user dir once migration is done (or found unnecessary)
+_MIGRATED_SENTINEL = ".migrated_v1"
+
+
+def _mark_migrated(user_dir: str) -> None:
+    open(os.path.join(user_dir, _MIGRATED_SENTINEL), "w").close()
 
 
 def _migrate_admin_data():
     """One-time migration: move legacy root data files to data/users/<ADMIN_USER_ID>/."""
     user_dir = get_user_data_dir(ADMIN_USER_ID)
-    print(f"[migration] Checking migration for admin {ADMIN_USER_ID}")
-    print(f"[migration] Root data dir: {_DATA_DIR}")
-    print(f"[migration] Target user dir: {user_dir}")
+    if os.path.exists(os.path.join(user_dir, _MIGRATED_SENTINEL)):
+        return False
+    logger.debug("[migration] Checking migration for admin %s", ADMIN_USER_ID)
+    logger.debug("[migration] Root data dir: %s", _DATA_DIR)
+    logger.debug("[migration] Target user dir: %s", user_dir)
 
-    # Only migrate if the user dir is empty/missing and root files exist
-    if os.path.exists(user_dir) and os.listdir(user_dir):
-        print(f"[migration] SKIP — user dir already exists with contents: {os.listdir(user_dir)}")
+    # Only migrate if the user dir is empty and root files exist
+    existing = os.listdir(user_dir)
+    if existing:
+        logger.info("[migration] SKIP — user dir already exists with contents: %s", existing)
+        _mark_migrated(user_dir)
         return False
 
-    files_to_move = [
-        "calendar_raw_full.csv",
-        "calendar.db",
-        "calendar_events.db",
-        "taxonomy.json",
-        "discovery_cache.json",
-        "enrichment_cache.json",
-        "google_token.json",
-    ]
-    dirs_to_move = ["calendar_vectors"]
+    # One readdir of the root instead of stat-ing every candidate name
+    with os.scandir(_DATA_DIR) as it:
+        present = {entry.name: entry for entry in it}
 
     # Log what exists at root
-    for name in files_to_move + dirs_to_move:
-        src = os.path.join(_DATA_DIR, name)
-        exists = os.path.exists(src)
-        print(f"[migration]   {name}: {'FOUND' if exists else 'not found'}")
+    if logger.isEnabledFor(logging.DEBUG):
+        for name in _MIGRATE_ALL:
+            logger.debug("[migration]   %s: %s", name, "FOUND" if name in present else "not found")
 
-    has_anything = any(
-        os.path.exists(os.path.join(_DATA_DIR, f)) for f in files_to_move + dirs_to_move
-    )
-    if not has_anything:
-        print("[migration] SKIP — no root files to migrate")
+    if present.keys().isdisjoint(_MIGRATE_ALL):
+        logger.info("[migration] SKIP — no root files to migrate")
         return False
 
-    os.makedirs(user_dir, exist_ok=True)
     migrated = []
 
-    for name in files_to_move:
-        src = os.path.join(_DATA_DIR, name)
-        if os.path.exists(src):
-            shutil.move(src, os.path.join(user_dir, name))
+    for name in _MIGRATE_FILES:
+        if name in present:
+            _move(present[name].path, os.path.join(user_dir, name))
             migrated.append(name)
 
-    for name in dirs_to_move:
-        src = os.path.join(_DATA_DIR, name)
-        if os.path.isdir(src):
-            shutil.move(src, os.path.join(user_dir, name))
+    for name in _MIGRATE_DIRS:
+        if name in present and present[name].is_dir():
+            _move(present[name].path, os.path.join(user_dir, name))
             migrated.append(name + "/")
 
-    print(f"[migration] DONE — moved to {user_dir}: {', '.join(migrated)}")
+    logger.info("[migration] DONE — moved to %s: %s", user_dir, ", ".join(migrated))
+    _mark_migrated(user_dir)
 
     # Log final state of user dir
-    print(f"[migration] User dir contents: {os.listdir(user_dir)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[migration] User dir contents: %s", os.listdir(user_dir))
 
     return True
 
 
+def _has_calendar_db(user_dir: str) -> bool:
+    return any(
+        os.path.exists(os.path.join(user_dir, name))
+        for name in ("calendar_events.db", "calendar.db")
+    )
+
+
 def ensure_admin_registered():
     """Auto-register admin user on startup (needs OAuth sync like everyone else)."""
-    users = load_users()
-    admin_key = str(ADMIN_USER_ID)
-    print(f"[admin-reg] Admin key: {admin_key}, already registered: {admin_key in users}")
+    admin = get_user(ADMIN_USER_ID)
+    logger.debug("[admin-reg] Admin key: %s, already registered: %s", ADMIN_USER_ID, admin is not None)
 
     # Migrate legacy root data files on first run
     migrated = _migrate_admin_data()
 
-    if admin_key not in users:
+    if admin is not None and not migrated:
+        # Common path on every restart: nothing to check on disk
+        logger.debug("[admin-reg] Already registered, no migration — status=%s", admin.get("status"))
+        return
+
+    # Only a new registration or a fresh migration needs to look for a DB
+    has_db = _has_calendar_db(get_user_data_dir(ADMIN_USER_ID))
+
+    if admin is None:
         # Determine initial status: if migrated data includes a DB, mark ready
-        user_dir = get_user_data_dir(ADMIN_USER_ID)
-        has_db = os.path.exists(os.path.join(user_dir, "calendar_events.db")) or \
-                 os.path.exists(os.path.join(user_dir, "calendar.db"))
         status = "ready" if has_db else "registered"
-        print(f"[admin-reg] New registration — has_db={has_db}, status={status}")
-
-        users[admin_key] = {
-            "name": "Admin",
-            "status": status,
-            "registered_at": datetime.now().isoformat(),
-        }
-        save_users(users)
-    elif migrated:
-        # Already registered but just migrated data — update status if DB exists
-        user_dir = get_user_data_dir(ADMIN_USER_ID)
-        has_db = os.path.exists(os.path.join(user_dir, "calendar_events.db")) or \
-                 os.path.exists(os.path.join(user_dir, "calendar.db"))
-        print(f"[admin-reg] Already registered + migrated — has_db={has_db}, current status={users[admin_key].get('status')}")
-        if has_db and users[admin_key].get("status") != "ready":
-            users[admin_key]["status"] = "ready"
-            save_users(users)
+        logger.info("[admin-reg] New registration — has_db=%s, status=%s", has_db, status)
+        add_user(ADMIN_USER_ID, "Admin", status)
     else:
-        print(f"[admin-reg] Already registered, no migration — status={users[admin_key].get('status')}")
+        # Already registered but just migrated data — update status if DB exists
+        logger.info(
+            "[admin-reg] Already registered + migrated — has_db=%s, current status=%s",
+            has_db, admin.get("status"),
+        )
+        if has_db and admin.get("status") != "ready":
+            update_user(ADMIN_USER_ID, status="ready")
@@ -1,8 +1,36 @@
 """Quick verification of the enriched database."""
+import random
+from collections import defaultdict
+
 from db import run_sql
 
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+
+def _sample_events(columns, where, k):
+    """Pick up to k random matching events by seeking to random rowids instead of
+    ORDER BY RANDOM(), which evaluates random() for every row and sorts."""
+    bounds = run_sql("SELECT (SELECT min(rowid) FROM events) AS lo, (SELECT max(rowid) FROM events) AS hi")[0]
+    if bounds["lo"] is None:
+        return []
+    picked = {}
+    # A few spare tries make up for repeats and for seeks past the last match
+    for _ in range(k * 4):
+        if len(picked) == k:
+            break
+        rows = run_sql(
+            f"SELECT rowid, {columns} FROM events WHERE rowid >= ? AND ({where}) LIMIT 1",
+            max_rows=1, params=(random.randint(bounds["lo"], bounds["hi"]),),
+        )
+        if rows:
+            picked[rows[0]["rowid"]] = rows[0]
+    return list(picked.values())
+
+
 print("=== SAMPLE ENRICHED EVENTS ===")
-samples = run_sql("SELECT summary, categories, people, locations, work_depth, mood, is_productive, is_wasted_time FROM events WHERE people != '' ORDER BY RANDOM() LIMIT 5")
+samples = _sample_events("summary, categories, people, locations, work_depth, mood, is_productive, is_wasted_time", "people != ''", 5)
 for s in samples:
     print(f'  Summary: {s["summary"]}')
     print(f'    categories={s["categories"]} | people={s["people"]} | locations={s["locations"]}')
@@ -10,26 +38,41 @@ for s in samples:
     print()
 
 print("=== COMPOUND EVENT DECOMPOSITION ===")
-compound = run_sql("SELECT e.summary, e.event_id FROM events e JOIN sub_activities sa ON e.event_id = sa.event_id GROUP BY e.event_id HAVING COUNT(*) > 3 ORDER BY RANDOM() LIMIT 2")
+# Group on the sub_activities(event_id) index alone, then sample the ids in Python
+compound_ids = [r["event_id"] for r in run_sql("SELECT event_id FROM sub_activities GROUP BY event_id HAVING COUNT(*) > 3", max_rows=None)]
+compound_ids = random.sample(compound_ids, min(2, len(compound_ids)))
+compound = run_sql(f"SELECT summary, event_id FROM events WHERE event_id IN ({_placeholders(compound_ids)})", params=compound_ids) if compound_ids else []
+# All sub-activities for the picked events in one query, grouped here
+subs_by_event = defaultdict(list)
+if compound_ids:
+    for sub in run_sql(f"SELECT event_id, activity, category FROM sub_activities WHERE event_id IN ({_placeholders(compound_ids)}) ORDER BY id", max_rows=None, params=compound_ids):
+        subs_by_event[sub["event_id"]].append(sub)
 for c in compound:
-    eid = c["event_id"]
     print(f'Event: "{c["summary"]}"')
-    subs = run_sql(f"SELECT activity, category FROM sub_activities WHERE event_id = '{eid}'")
-    for sub in subs:
+    for sub in subs_by_event[c["event_id"]]:
         print(f'  - {sub["activity"]} ({sub["category"]})')
     print()
 
 print("=== WASTED TIME EVENTS ===")
-wasted = run_sql("SELECT summary, date, duration_minutes FROM events WHERE is_wasted_time = 1 ORDER BY RANDOM() LIMIT 5")
+wasted = _sample_events("summary, date, duration_minutes", "is_wasted_time = 1", 5)
 for w in wasted:
     print(f'  {w["date"]}: "{w["summary"]}" ({w["duration_minutes"]} min)')
 
+# Both distributions in one round-trip, split by kind below
+distributions = defaultdict(list)
+for row in run_sql(
+    "SELECT 'depth' AS kind, work_depth AS value, COUNT(*) AS cnt FROM events WHERE work_depth IS NOT NULL GROUP BY work_depth "
+    "UNION ALL "
+    "SELECT 'mood', mood, COUNT(*) FROM events WHERE mood IS NOT NULL GROUP BY mood "
+    "ORDER BY kind, cnt DESC",
+    max_rows=None,
+):
+    distributions[row["kind"]].append(row)
+
 print("\n=== WORK DEPTH DISTRIBUTION ===")
-depths = run_sql("SELECT work_depth, COUNT(*) as cnt FROM events WHERE work_depth IS NOT NULL GROUP BY work_depth ORDER BY cnt DESC")
-for d in depths:
-    print(f'  {d["work_depth"]}: {d["cnt"]}')
+for d in distributions["depth"]:
+    print(f'  {d["value"]}: {d["cnt"]}')
 
 print("\n=== MOOD DISTRIBUTION ===")
-moods = run_sql("SELECT mood, COUNT(*) as cnt FROM events WHERE mood IS NOT NULL GROUP BY mood ORDER BY cnt DESC")
-for m in moods:
-    print(f'  {m["mood"]}: {m["cnt"]}')
+for m in distributions["mood"]:
+    print(f'  {m["value"]}: {m["cnt"]}')